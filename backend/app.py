@@ -1,5 +1,6 @@
 from flask import Flask, send_from_directory, jsonify
 import os
+import retention
 
 app = Flask(__name__)
 BASE_FOLDER = os.path.join(os.path.dirname(__file__), 'fight_screenshots')
@@ -18,7 +19,9 @@ def debug():
     return jsonify({
         "base_folder": BASE_FOLDER,
         "exists": exists,
-        "contents": contents
+        "contents": contents,
+        "disk": retention.disk_usage(BASE_FOLDER),
+        "retention": retention.load_stats(BASE_FOLDER)
     })
 
 # -------------------------
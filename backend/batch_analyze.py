@@ -0,0 +1,379 @@
+"""
+Offline batch analysis for archived footage.
+
+Shards videos (or time ranges within one video) across a process pool,
+runs detection + tracking headless and faster than real time, and
+writes a report of candidate incident windows.
+
+    python batch_analyze.py violentVideos/0.mp4 violentVideos/2.mp4
+    python batch_analyze.py long.mp4 --shard-seconds 300 -o report.parquet
+    python batch_analyze.py long.mp4 --ranges 0-600 1800-2400 --gemini
+
+Every candidate gets the local clip prescore (clip_scorer.py); with
+--gemini the report can be fed to calibrate_scorer.py.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import config
+from clip_manager import save_clip, TOTAL_FRAMES
+from utils import load_video_metadata
+from detection import load_roi, AdaptiveScheduler, detect_people, track_people
+from clip_scorer import TrackStats, clip_features, score_features
+
+# Loaded once per worker process
+_model = None
+
+
+def _init_worker():
+    global _model
+    # One inference thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    from ultralytics import YOLO
+    _model = YOLO(config.YOLO_MODEL)
+
+
+# -------------------------
+# Sharding
+# -------------------------
+def video_duration(video_path):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    return frames / fps
+
+
+def parse_range(text):
+    start, end = text.split("-")
+    return float(start), float(end)
+
+
+def _split(video_path, start, end, shard_seconds):
+    if not shard_seconds or end is None:
+        return [(video_path, start, end)]
+
+    shards = []
+    while start < end:
+        shards.append((video_path, start, min(start + shard_seconds, end)))
+        start += shard_seconds
+    return shards
+
+
+def build_shards(video_paths, ranges=None, shard_seconds=None):
+    """
+    Returns list of (video_path, start_seconds, end_seconds).
+    end_seconds is None for "until the end of the file".
+    Ranges longer than shard_seconds are split too.
+    """
+    shards = []
+
+    for video_path in video_paths:
+        if ranges:
+            for start, end in ranges:
+                shards.extend(_split(video_path, start, end, shard_seconds))
+            continue
+
+        if not shard_seconds:
+            shards.append((video_path, 0.0, None))
+            continue
+
+        duration = video_duration(video_path)
+        if duration <= 0:
+            print(f"[Batch] {video_path}: unknown duration, scanning as one shard.")
+            shards.append((video_path, 0.0, None))
+            continue
+
+        shards.extend(_split(video_path, 0.0, duration, shard_seconds))
+
+    return shards
+
+
+# -------------------------
+# Worker: detection + tracking
+# -------------------------
+def analyze_shard(shard):
+    """
+    Scans one shard and returns candidate windows where tracked people
+    move faster than SPEED_THRESHOLD. Windows close after
+    THREAT_COOLDOWN seconds without movement.
+    """
+    video_path, start, end = shard
+    metadata = load_video_metadata(video_path)
+    roi = load_roi(metadata)
+    scheduler = AdaptiveScheduler()
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frame_idx = int(start * fps)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+
+    prev_centers = {}
+    candidates = []
+    window = None
+    frames_scanned = 0
+    t = start
+    started = time.time()
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        t = frame_idx / fps
+        if end is not None and t >= end:
+            break
+        frame_idx += 1
+        frames_scanned += 1
+
+        frame_resized = cv2.resize(frame, config.FRAME_SIZE)
+        people = detect_people(_model, frame_resized, roi, scheduler.imgsz(t))
+        prev_centers, tracks = track_people(prev_centers, people)
+
+        speeds = [s for *_, s in tracks if s is not None]
+        peak = max(speeds, default=0.0)
+
+        if peak > config.SPEED_THRESHOLD:
+            scheduler.mark_active(t)
+
+            if window is None:
+                window = {
+                    "video": video_path,
+                    "start": t,
+                    "end": t,
+                    "peak_speed": peak,
+                    "speed_sum": 0.0,
+                    "motion_frames": 0
+                }
+            window["end"] = t
+            window["peak_speed"] = max(window["peak_speed"], peak)
+            window["speed_sum"] += peak
+            window["motion_frames"] += 1
+
+        elif window is not None and t - window["end"] > config.THREAT_COOLDOWN:
+            candidates.append(_finish_window(window))
+            window = None
+
+    if window is not None:
+        candidates.append(_finish_window(window))
+
+    cap.release()
+
+    elapsed = time.time() - started
+    print(
+        f"[Batch] {os.path.basename(video_path)} "
+        f"{start:.0f}-{t:.0f}s: "
+        f"{frames_scanned} frames in {elapsed:.1f}s, "
+        f"{len(candidates)} candidates"
+    )
+    return candidates
+
+
+def _finish_window(window):
+    window = dict(window)
+    speed_sum = window.pop("speed_sum")
+    window["mean_speed"] = speed_sum / window["motion_frames"]
+    return window
+
+
+def merge_candidates(candidates):
+    """
+    Joins windows from neighbouring shards that belong to the same
+    incident (gap of at most THREAT_COOLDOWN seconds).
+    """
+    merged = []
+
+    for c in sorted(candidates, key=lambda c: (c["video"], c["start"])):
+        last = merged[-1] if merged else None
+        if (
+            last is not None and
+            last["video"] == c["video"] and
+            c["start"] - last["end"] <= config.THREAT_COOLDOWN
+        ):
+            frames = last["motion_frames"] + c["motion_frames"]
+            last["mean_speed"] = (
+                last["mean_speed"] * last["motion_frames"] +
+                c["mean_speed"] * c["motion_frames"]
+            ) / frames
+            last["motion_frames"] = frames
+            last["end"] = max(last["end"], c["end"])
+            last["peak_speed"] = max(last["peak_speed"], c["peak_speed"])
+        else:
+            merged.append(dict(c))
+
+    return merged
+
+
+# -------------------------
+# Worker: clip scoring and optional Gemini review
+# -------------------------
+def read_clip_frames(video_path, start):
+    """
+    Reads a clip starting at `start` the same way the live recorder
+    does: TOTAL_FRAMES consecutive frames at FRAME_SIZE.
+    """
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+
+    frames = []
+    while len(frames) < TOTAL_FRAMES:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, config.FRAME_SIZE))
+
+    cap.release()
+    return frames
+
+
+def score_candidate(candidate):
+    """Adds clip features and the local prescore to a candidate window."""
+    frames = read_clip_frames(candidate["video"], candidate["start"])
+    roi = load_roi(load_video_metadata(candidate["video"]))
+
+    prev_centers = {}
+    track_stats = TrackStats()
+    for frame in frames:
+        people = detect_people(_model, frame, roi)
+        prev_centers, tracks = track_people(prev_centers, people)
+        track_stats.add(tracks)
+
+    features = clip_features(frames, track_stats)
+    return {
+        **candidate,
+        "features": features,
+        "prescore": score_features(features)
+    }
+
+
+def review_candidate(candidate):
+    """
+    Adds Gemini's verdict for the candidate's clip. Errors are recorded
+    on the candidate so one failed upload doesn't lose the batch.
+    """
+    folder = None
+    try:
+        from gemini_client import summarize_fight
+
+        frames = read_clip_frames(candidate["video"], candidate["start"])
+        # Private folder per call: workers exporting in the same
+        # millisecond would otherwise share a clip filename
+        base = os.path.join(config.OUTPUT_FOLDER, "temp", "batch")
+        os.makedirs(base, exist_ok=True)
+        folder = tempfile.mkdtemp(dir=base)
+        clip_path = save_clip(frames, folder)
+        if not clip_path:
+            return {**candidate, "gemini_score": None, "gemini_explanation": "Clip export failed"}
+
+        result = summarize_fight(clip_path)
+    except Exception as e:
+        print("[Batch] Gemini review failed:", e)
+        return {**candidate, "gemini_score": None, "gemini_explanation": f"Gemini failed: {e}"}
+    finally:
+        if folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        **candidate,
+        "gemini_score": result["score"],
+        "gemini_explanation": result["explanation"]
+    }
+
+
+# -------------------------
+# Report
+# -------------------------
+def check_output(output_path):
+    """Fails fast, before any analysis, if the report can't be written."""
+    if output_path.endswith(".parquet"):
+        try:
+            import pandas
+            import pyarrow
+        except ImportError:
+            sys.exit("Parquet output needs pandas and pyarrow installed.")
+
+
+def write_report(candidates, output_path, shards):
+    if output_path.endswith(".parquet"):
+        import pandas as pd
+        pd.json_normalize(candidates).to_parquet(output_path, index=False)
+    else:
+        report = {
+            "generated_at": time.time(),
+            "shards": [
+                {"video": v, "start": s, "end": e} for v, s, e in shards
+            ],
+            "candidates": candidates
+        }
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"[Batch] Wrote {len(candidates)} candidates to {output_path}")
+
+
+def run_batch(video_paths, ranges=None, shard_seconds=None, workers=None,
+              output_path="batch_report.json", gemini=False):
+    check_output(output_path)
+    shards = build_shards(video_paths, ranges, shard_seconds)
+    workers = workers or os.cpu_count() or 1
+    print(f"[Batch] {len(shards)} shards on {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        candidates = []
+        for shard_candidates in pool.map(analyze_shard, shards):
+            candidates.extend(shard_candidates)
+
+        candidates = merge_candidates(candidates)
+        candidates = list(pool.map(score_candidate, candidates))
+
+        # Save detection results before the slow, failure-prone Gemini phase
+        write_report(candidates, output_path, shards)
+
+        if gemini and candidates:
+            print(f"[Batch] Sending {len(candidates)} candidates to Gemini")
+            candidates = list(pool.map(review_candidate, candidates))
+            write_report(candidates, output_path, shards)
+
+    return candidates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch analysis of recorded footage")
+    parser.add_argument("videos", nargs="+", help="video files to analyze")
+    parser.add_argument("--ranges", nargs="+", metavar="START-END",
+                        help="time ranges in seconds to scan within each video")
+    parser.add_argument("--shard-seconds", type=float,
+                        help="split each video into shards of this many seconds")
+    parser.add_argument("--workers", type=int, help="process count (default: all cores)")
+    parser.add_argument("-o", "--output", default="batch_report.json",
+                        help="report path, .json or .parquet")
+    parser.add_argument("--gemini", action="store_true",
+                        help="send candidate windows to Gemini for scoring")
+    args = parser.parse_args(argv)
+
+    ranges = [parse_range(r) for r in args.ranges] if args.ranges else None
+
+    run_batch(
+        args.videos,
+        ranges=ranges,
+        shard_seconds=args.shard_seconds,
+        workers=args.workers,
+        output_path=args.output,
+        gemini=args.gemini
+    )
+
+
+if __name__ == "__main__":
+    main()
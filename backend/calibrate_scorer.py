@@ -0,0 +1,171 @@
+"""
+Calibrates the local clip scorer against Gemini's verdicts.
+
+Takes batch reports produced with `batch_analyze.py --gemini`, fits a
+logistic regression from clip features to "Gemini score above
+THREAT_THRESHOLD", writes the weights to PRESCORE_CALIBRATION and
+reports the skip rate and missed threats at the recommended floor,
+measured on held-out rows (cross-validation).
+
+    python batch_analyze.py violentVideos/*.mp4 --gemini -o sample_report.json
+    python calibrate_scorer.py sample_report.json
+    python calibrate_scorer.py sample_report.json --report-only
+"""
+import json
+import argparse
+import numpy as np
+import config
+from clip_scorer import FEATURE_NAMES, load_weights, score_features, prescore_floor
+
+
+def load_labeled(report_paths):
+    rows = []
+    for path in report_paths:
+        with open(path) as f:
+            report = json.load(f)
+        for c in report.get("candidates", []):
+            if c.get("gemini_score") is not None and c.get("features"):
+                rows.append(c)
+    return rows
+
+
+def fit_weights(X, y, l2=0.01, lr=0.1, steps=5000):
+    """
+    Class-balanced logistic regression by gradient descent on
+    standardized features. Returns weights in raw feature units.
+    """
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1
+    Xs = (X - mean) / std
+
+    pos = max(y.sum(), 1)
+    neg = max(len(y) - y.sum(), 1)
+    sample_weight = np.where(y == 1, len(y) / (2 * pos), len(y) / (2 * neg))
+
+    w = np.zeros(X.shape[1])
+    b = 0.0
+    for _ in range(steps):
+        p = 1 / (1 + np.exp(-(Xs @ w + b)))
+        err = (p - y) * sample_weight
+        w -= lr * (Xs.T @ err / len(y) + l2 * w)
+        b -= lr * err.mean()
+
+    raw_w = w / std
+    raw_b = b - float(np.sum(w * mean / std))
+
+    weights = {"bias": raw_b}
+    weights.update({name: float(v) for name, v in zip(FEATURE_NAMES, raw_w)})
+    return weights
+
+
+def skip_report(prescores, y, floor):
+    skipped = prescores < floor
+    return {
+        "floor": floor,
+        "clips": int(len(y)),
+        "threats": int(y.sum()),
+        "skipped": int(skipped.sum()),
+        "skip_rate": float(skipped.mean()) if len(y) else 0.0,
+        "missed_threats": int((skipped & (y == 1)).sum()),
+    }
+
+
+def recommend_floor(prescores, y):
+    """Highest floor that still sends every Gemini-confirmed threat."""
+    if not y.any():
+        return 0.0
+    return float(prescores[y == 1].min()) * 0.9
+
+
+def cross_validate(X, y, floor=None, folds=10, seed=0):
+    """
+    Held-out skip rate and misses: each row is scored by weights fitted
+    without it, at the floor recommended on the training rows (or the
+    given `floor`). Uses leave-one-out when there are <= `folds` rows.
+    """
+    order = np.random.default_rng(seed).permutation(len(y))
+    skipped = np.zeros(len(y), dtype=bool)
+    floors = []
+
+    for test in np.array_split(order, min(folds, len(y))):
+        train = np.setdiff1d(order, test)
+        weights = fit_weights(X[train], y[train])
+        train_scores = _prescores(X[train], weights)
+        fold_floor = floor if floor is not None else recommend_floor(train_scores, y[train])
+        skipped[test] = _prescores(X[test], weights) < fold_floor
+        floors.append(fold_floor)
+
+    return {
+        "floor": float(np.mean(floors)),
+        "clips": int(len(y)),
+        "threats": int(y.sum()),
+        "skipped": int(skipped.sum()),
+        "skip_rate": float(skipped.mean()),
+        "missed_threats": int((skipped & (y == 1)).sum()),
+    }
+
+
+def _prescores(X, weights):
+    return np.array([
+        score_features(dict(zip(FEATURE_NAMES, x)), weights) for x in X
+    ])
+
+
+def print_report(report, label):
+    print(
+        f"[Calibrate] {label}, floor {report['floor']:.3f}: "
+        f"skipped {report['skipped']}/{report['clips']} clips "
+        f"({report['skip_rate']:.0%}), "
+        f"missed {report['missed_threats']}/{report['threats']} threats"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the local clip scorer")
+    parser.add_argument("reports", nargs="+", help="batch reports run with --gemini")
+    parser.add_argument("--floor", type=float, default=None,
+                        help="use this floor instead of the recommended one")
+    parser.add_argument("--report-only", action="store_true",
+                        help="evaluate the current weights without refitting")
+    parser.add_argument("-o", "--output", default=config.PRESCORE_CALIBRATION)
+    args = parser.parse_args(argv)
+
+    rows = load_labeled(args.reports)
+    if not rows:
+        raise SystemExit("No Gemini-labeled candidates found in the reports.")
+
+    X = np.array([[r["features"].get(n, 0.0) for n in FEATURE_NAMES] for r in rows])
+    y = np.array([1 if r["gemini_score"] > config.THREAT_THRESHOLD else 0 for r in rows])
+
+    if args.report_only:
+        # Existing weights with their own floor, on these (new) reports
+        prescores = _prescores(X, load_weights())
+        floor = args.floor if args.floor is not None else prescore_floor()
+        print_report(skip_report(prescores, y, floor), "current weights")
+        return
+
+    if len(y) < 2:
+        raise SystemExit("Need at least 2 labeled candidates to calibrate.")
+
+    # Held-out numbers are the ones that predict behaviour on new clips;
+    # in-sample misses at the recommended floor are 0 by construction.
+    report = cross_validate(X, y, args.floor)
+    print_report(report, "held-out")
+
+    weights = fit_weights(X, y)
+    recommended = args.floor if args.floor is not None else recommend_floor(_prescores(X, weights), y)
+    print_report(skip_report(_prescores(X, weights), y, recommended), "in-sample")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "weights": weights,
+            "recommended_floor": recommended,
+            "trained_on": args.reports,
+            "report": report
+        }, f, indent=2)
+    print(f"[Calibrate] Wrote weights to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,43 +2,92 @@ import os
 import cv2
 import time
 import config
+import job_queue
 
 CLIP_DURATION_SECONDS = 5
 CLIP_FPS = 15
 TOTAL_FRAMES = CLIP_DURATION_SECONDS * CLIP_FPS
 
 
+class ClipWriter:
+    """
+    Streams frames straight to disk, then converts to H264 on finish().
+    """
+
+    def __init__(self, folder, size):
+        os.makedirs(folder, exist_ok=True)
+
+        filename = f"clip_{int(time.time()*1000)}.mp4"
+        self.raw_path = os.path.join(folder, filename.replace(".mp4", "_raw.mp4"))
+        self.final_path = os.path.join(folder, filename)
+
+        self.writer = cv2.VideoWriter(
+            self.raw_path,
+            cv2.VideoWriter_fourcc(*"mp4v"),
+            CLIP_FPS,
+            size
+        )
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def finish(self):
+        self.writer.release()
+
+        # Convert to H264
+        cmd = f'ffmpeg -y -i "{self.raw_path}" -vcodec libx264 -preset fast -crf 23 "{self.final_path}"'
+        if os.system(cmd) != 0:
+            print("FFmpeg failed.")
+            return None
+
+        os.remove(self.raw_path)
+        print("Clip saved:", self.final_path)
+
+        return self.final_path
+
+    def abort(self):
+        self.writer.release()
+        if os.path.exists(self.raw_path):
+            os.remove(self.raw_path)
+
+
 def save_clip(frames, folder):
     if not frames:
         return None
 
-    os.makedirs(folder, exist_ok=True)
-
-    filename = f"clip_{int(time.time()*1000)}.mp4"
-    raw_path = os.path.join(folder, filename.replace(".mp4", "_raw.mp4"))
-    final_path = os.path.join(folder, filename)
-
     h, w = frames[0].shape[:2]
-
-    writer = cv2.VideoWriter(
-        raw_path,
-        cv2.VideoWriter_fourcc(*"mp4v"),
-        CLIP_FPS,
-        (w, h)
-    )
+    clip = ClipWriter(folder, (w, h))
 
     for frame in frames:
-        writer.write(frame)
+        clip.write(frame)
 
-    writer.release()
+    return clip.finish()
 
-    # Convert to H264
-    cmd = f'ffmpeg -y -i "{raw_path}" -vcodec libx264 -preset fast -crf 23 "{final_path}"'
-    if os.system(cmd) != 0:
-        print("FFmpeg failed.")
+
+def save_deferred_clip(frames, metadata, prescore):
+    """
+    Keeps a clip that scored below the prescore floor and records it
+    as a deferred job, so it can be reviewed or sent to Gemini later
+    with job_queue.requeue_deferred().
+    """
+    folder = os.path.join(config.OUTPUT_FOLDER, "deferred")
+    clip_path = save_clip(frames, folder)
+    if not clip_path:
         return None
 
-    os.remove(raw_path)
-    print("Clip saved:", final_path)
+    job_queue.enqueue(clip_path, metadata, prescore, state="deferred")
+    return clip_path
+
+
+def defer_clip(clip_path, metadata, prescore):
+    """
+    Same as save_deferred_clip for a clip that is already on disk.
+    """
+    folder = os.path.join(config.OUTPUT_FOLDER, "deferred")
+    os.makedirs(folder, exist_ok=True)
+
+    dest = os.path.join(folder, os.path.basename(clip_path))
+    os.replace(clip_path, dest)
 
-    return final_path
\ No newline at end of file
+    job_queue.enqueue(dest, metadata, prescore, state="deferred")
+    return dest
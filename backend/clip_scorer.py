@@ -0,0 +1,206 @@
+"""
+Local, CPU-cheap pre-scoring of recorded clips.
+
+Runs before a clip is uploaded to Gemini and estimates the probability
+that Gemini will score it above THREAT_THRESHOLD, from:
+  - tracker speed statistics
+  - dense optical-flow energy
+  - person proximity / box overlap
+
+Weights come from scorer_calibration.json (see calibrate_scorer.py),
+falling back to hand-tuned defaults. The gate is opt-in: without a
+calibration file (or an explicit PRESCORE_FLOOR) the floor is 0 and
+every clip still goes to Gemini.
+"""
+import os
+import json
+import cv2
+import numpy as np
+import config
+
+FEATURE_NAMES = [
+    "speed_mean",
+    "speed_p90",
+    "fast_fraction",
+    "flow_mean",
+    "flow_p90",
+    "people_mean",
+    "max_overlap",
+    "close_fraction",
+]
+
+# Uncalibrated starting point; replaced by calibrate_scorer.py output
+DEFAULT_WEIGHTS = {
+    "bias": -3.0,
+    "speed_mean": 0.02,
+    "speed_p90": 0.05,
+    "fast_fraction": 3.0,
+    "flow_mean": 0.8,
+    "flow_p90": 0.3,
+    "people_mean": 0.2,
+    "max_overlap": 2.5,
+    "close_fraction": 1.5,
+}
+
+FLOW_SIZE = (160, 90)   # optical flow runs on a small grayscale copy
+FLOW_STEP = 2           # compare every 2nd frame
+
+
+# -------------------------
+# Tracker statistics
+# -------------------------
+def _iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+class TrackStats:
+    """
+    Collects per-frame tracker output while a clip is recorded.
+    Feed it the `tracks` list from detection.track_people.
+    """
+
+    def __init__(self):
+        self.speeds = []
+        self.people_counts = []
+        self.overlaps = []
+        self.close_frames = 0
+        self.frames = 0
+
+    def add(self, tracks):
+        self.frames += 1
+        self.people_counts.append(len(tracks))
+        self.speeds.extend(s for *_, s in tracks if s is not None)
+
+        boxes = [t[:4] for t in tracks]
+        max_overlap = 0.0
+        close = False
+
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                max_overlap = max(max_overlap, _iou(a, b))
+
+                # Centers closer than one average box height
+                ca = ((a[0] + a[2]) / 2, (a[1] + a[3]) / 2)
+                cb = ((b[0] + b[2]) / 2, (b[1] + b[3]) / 2)
+                dist = np.hypot(ca[0] - cb[0], ca[1] - cb[1])
+                height = ((a[3] - a[1]) + (b[3] - b[1])) / 2
+                if height > 0 and dist < height:
+                    close = True
+
+        self.overlaps.append(max_overlap)
+        if close:
+            self.close_frames += 1
+
+    def features(self):
+        speeds = np.array(self.speeds) if self.speeds else np.zeros(1)
+        frames = max(self.frames, 1)
+        return {
+            "speed_mean": float(speeds.mean()),
+            "speed_p90": float(np.percentile(speeds, 90)),
+            "fast_fraction": float(np.mean(speeds > config.SPEED_THRESHOLD)),
+            "people_mean": float(np.mean(self.people_counts)) if self.people_counts else 0.0,
+            "max_overlap": float(max(self.overlaps, default=0.0)),
+            "close_fraction": self.close_frames / frames,
+        }
+
+
+# -------------------------
+# Optical flow
+# -------------------------
+class FlowMeter:
+    """
+    Mean and 90th percentile Farneback flow magnitude over a clip,
+    in pixels per frame at FLOW_SIZE. Frames are fed one at a time so
+    streaming recorders don't need to keep the clip in memory.
+    """
+
+    def __init__(self):
+        self.prev = None
+        self.count = 0
+        self.magnitudes = []
+
+    def add(self, frame):
+        index = self.count
+        self.count += 1
+        if index % FLOW_STEP:
+            return
+
+        gray = cv2.cvtColor(cv2.resize(frame, FLOW_SIZE), cv2.COLOR_BGR2GRAY)
+        if self.prev is not None:
+            flow = cv2.calcOpticalFlowFarneback(
+                self.prev, gray, None, 0.5, 2, 9, 2, 5, 1.1, 0
+            )
+            mag = np.sqrt(flow[..., 0] ** 2 + flow[..., 1] ** 2)
+            self.magnitudes.append(float(mag.mean()))
+        self.prev = gray
+
+    def features(self):
+        if not self.magnitudes:
+            return {"flow_mean": 0.0, "flow_p90": 0.0}
+
+        return {
+            "flow_mean": float(np.mean(self.magnitudes)),
+            "flow_p90": float(np.percentile(self.magnitudes, 90)),
+        }
+
+
+def flow_energy(frames):
+    meter = FlowMeter()
+    for frame in frames:
+        meter.add(frame)
+    return meter.features()
+
+
+def clip_features(frames, track_stats):
+    return {**track_stats.features(), **flow_energy(frames)}
+
+
+# -------------------------
+# Scoring
+# -------------------------
+_calibration = None
+
+
+def load_calibration(path=config.PRESCORE_CALIBRATION):
+    """Contents of the calibration file, or {} if it hasn't been run."""
+    global _calibration
+    if _calibration is None:
+        _calibration = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                _calibration = json.load(f)
+    return _calibration
+
+
+def load_weights():
+    return {**DEFAULT_WEIGHTS, **load_calibration().get("weights", {})}
+
+
+def prescore_floor():
+    """
+    PRESCORE_FLOOR if set, else the calibrated recommended_floor,
+    else 0 so uncalibrated weights never hold back a clip.
+    """
+    if config.PRESCORE_FLOOR is not None:
+        return config.PRESCORE_FLOOR
+    return load_calibration().get("recommended_floor", 0.0)
+
+
+def score_features(features, weights=None):
+    """
+    Returns the estimated probability (0-1) that Gemini will flag
+    this clip as a threat.
+    """
+    weights = weights or load_weights()
+    z = weights["bias"] + sum(
+        weights[name] * features.get(name, 0.0) for name in FEATURE_NAMES
+    )
+    return float(1 / (1 + np.exp(-z)))
@@ -11,4 +11,41 @@ GEMINI_COOLDOWN = 10       # seconds between Gemini API calls
 
 PROCESS_EVERY = 10         # process every N frames
 SPEED_THRESHOLD = 15       # movement threshold to trigger fight
-THREAT_COOLDOWN = 5        # seconds without movement to end threat
\ No newline at end of file
+THREAT_COOLDOWN = 5        # seconds without movement to end threat
+
+# Adaptive detection
+FRAME_SIZE = (640, 360)    # working resolution (width, height)
+DETECT_IMGSZ_IDLE = 320    # detector input size while the scene is idle
+DETECT_IMGSZ_ACTIVE = 640  # detector input size around active tracks
+ACTIVE_HOLD_SECONDS = 3    # stay at full resolution this long after motion
+
+# Local clip pre-scoring
+THREAT_THRESHOLD = 6       # Gemini score above this is a threat
+# Opt-in: the gate is off (floor 0) until calibrate_scorer.py has written
+# PRESCORE_CALIBRATION; its recommended_floor is used from then on.
+# Set PRESCORE_FLOOR to a number to override.
+PRESCORE_FLOOR = None      # clips scoring below the floor never reach Gemini
+PRESCORE_ACTION = "defer"  # "drop" or "defer" clips below the floor
+PRESCORE_CALIBRATION = "scorer_calibration.json"
+
+# Gemini job queue
+JOB_QUEUE_DB = "jobs.db"
+GEMINI_WORKERS = 2         # threads consuming the queue
+JOB_LEASE_SECONDS = 300    # a claimed job is retried after this long
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 1      # seconds between polls when the queue is empty
+
+# Disk retention for OUTPUT_FOLDER
+RETENTION_GLOBAL_QUOTA_MB = 2048
+RETENTION_CAMERA_QUOTA_MB = 512
+RETENTION_MAX_AGE_HOURS = 72     # resolved threats older than this are removed
+TEMP_MAX_AGE_SECONDS = 600       # unreferenced temp clips older than this are removed
+RETENTION_INTERVAL = 60          # seconds between retention passes
+RETENTION_DELETE_BATCH = 20      # paths deleted per batch
+RETENTION_DELETE_PAUSE = 0.2     # seconds between delete batches
+RETENTION_STATS_FILE = "retention_stats.json"  # written inside OUTPUT_FOLDER
+
+# Multiprocess pipeline (video_pipeline.py)
+MULTIPROCESS = False             # decode, inference and recording in separate processes
+FRAME_RING_SLOTS = 32            # shared-memory frame slots per camera
+PIPELINE_START_METHOD = "spawn"  # don't fork a process that already runs threads
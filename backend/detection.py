@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+import config
+
+
+# -------------------------
+# Region of interest
+# -------------------------
+class RegionOfInterest:
+    """
+    Pixel mask of the area we care about for one camera.
+    Detection runs on the bounding box of the mask only, with
+    excluded pixels blacked out.
+    """
+
+    def __init__(self, mask):
+        self.mask = mask
+        ys, xs = np.nonzero(mask)
+        self.empty = len(xs) == 0
+
+        if self.empty:
+            self.x1 = self.y1 = self.x2 = self.y2 = 0
+        else:
+            self.x1, self.y1 = int(xs.min()), int(ys.min())
+            self.x2, self.y2 = int(xs.max()) + 1, int(ys.max()) + 1
+
+        crop_mask = mask[self.y1:self.y2, self.x1:self.x2]
+        # Skip the bitwise_and when the crop has nothing masked out
+        self.needs_mask = not self.empty and not np.all(crop_mask)
+
+    def crop(self, frame):
+        region = frame[self.y1:self.y2, self.x1:self.x2]
+        if not self.needs_mask:
+            return region
+        crop_mask = self.mask[self.y1:self.y2, self.x1:self.x2]
+        return cv2.bitwise_and(region, region, mask=crop_mask)
+
+    def contains(self, x, y):
+        h, w = self.mask.shape[:2]
+        x = min(max(x, 0), w - 1)
+        y = min(max(y, 0), h - 1)
+        return self.mask[y, x] > 0
+
+
+def _to_pixels(polygon, size):
+    w, h = size
+    return np.array(
+        [(int(round(x * w)), int(round(y * h))) for x, y in polygon],
+        dtype=np.int32
+    )
+
+
+def load_roi(metadata, size=config.FRAME_SIZE):
+    """
+    Builds the ROI from metadata["camera"]["roi"]:
+
+        "roi": {
+            "include": [[[x, y], ...], ...],   # polygons to watch
+            "exclude": [[[x, y], ...], ...]    # polygons to ignore
+        }
+
+    Coordinates are normalized 0-1 so they work at any resolution.
+    No include polygons means the whole frame.
+    Returns None when the camera has no ROI configured.
+    """
+    camera = (metadata or {}).get("camera", {})
+    roi = camera.get("roi")
+    if not roi:
+        return None
+
+    w, h = size
+    include = roi.get("include") or []
+    exclude = roi.get("exclude") or []
+
+    if include:
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for polygon in include:
+            cv2.fillPoly(mask, [_to_pixels(polygon, size)], 255)
+    else:
+        mask = np.full((h, w), 255, dtype=np.uint8)
+
+    for polygon in exclude:
+        cv2.fillPoly(mask, [_to_pixels(polygon, size)], 0)
+
+    region = RegionOfInterest(mask)
+    if region.empty:
+        print(f"[ROI] Camera {camera.get('camera_id')} is fully masked.")
+    return region
+
+
+# -------------------------
+# Adaptive resolution
+# -------------------------
+class AdaptiveScheduler:
+    """
+    Picks the detector input size. Runs cheap while the scene is idle
+    and switches to full resolution for a while after any motion.
+    `now` is passed in so offline runs can use video time.
+    """
+
+    def __init__(
+        self,
+        idle_imgsz=config.DETECT_IMGSZ_IDLE,
+        active_imgsz=config.DETECT_IMGSZ_ACTIVE,
+        hold_seconds=config.ACTIVE_HOLD_SECONDS
+    ):
+        self.idle_imgsz = idle_imgsz
+        self.active_imgsz = active_imgsz
+        self.hold_seconds = hold_seconds
+        self.last_active = None
+
+    def mark_active(self, now):
+        self.last_active = now
+
+    def is_active(self, now):
+        return (
+            self.last_active is not None and
+            now - self.last_active < self.hold_seconds
+        )
+
+    def imgsz(self, now):
+        return self.active_imgsz if self.is_active(now) else self.idle_imgsz
+
+
+# -------------------------
+# Person detection
+# -------------------------
+def detect_people(model, frame, roi=None, imgsz=config.DETECT_IMGSZ_ACTIVE):
+    """
+    Runs the detector on `frame` (or its ROI crop).
+    Returns list of (index, x1, y1, x2, y2) in frame coordinates.
+    """
+    offset_x, offset_y = 0, 0
+    source = frame
+
+    if roi is not None:
+        if roi.empty:
+            return []
+        source = roi.crop(frame)
+        offset_x, offset_y = roi.x1, roi.y1
+
+    results = model(source, imgsz=imgsz)
+    people = []
+
+    for r in results:
+        for i, box in enumerate(r.boxes):
+            cls = int(box.cls[0])
+            if model.names[cls] != "person":
+                continue
+
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            x1, x2 = x1 + offset_x, x2 + offset_x
+            y1, y2 = y1 + offset_y, y2 + offset_y
+
+            if roi is not None and not roi.contains((x1 + x2) // 2, (y1 + y2) // 2):
+                continue
+
+            people.append((i, x1, y1, x2, y2))
+
+    return people
+
+
+# -------------------------
+# Tracking
+# -------------------------
+def track_people(prev_centers, people):
+    """
+    Matches detections to the previous frame by index and measures
+    how far each center moved.
+    Returns (new_centers, tracks) where tracks is a list of
+    (x1, y1, x2, y2, speed); speed is None for new detections.
+    """
+    new_centers = {}
+    tracks = []
+
+    for i, x1, y1, x2, y2 in people:
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        new_centers[i] = (cx, cy)
+
+        prev = prev_centers.get(i)
+        speed = None
+
+        if prev:
+            dx = abs(cx - prev[0])
+            dy = abs(cy - prev[1])
+            speed = float(np.sqrt(dx**2 + dy**2))
+
+        tracks.append((x1, y1, x2, y2, speed))
+
+    return new_centers, tracks
@@ -103,6 +103,18 @@ def end_threat(threat_id):
         "end_time": firestore.SERVER_TIMESTAMP
     })
 
+# -------------------------
+# Get specific threats
+# -------------------------
+def get_threats(threat_ids):
+    """
+    Batch-reads only the given threats. Missing documents are left out.
+    """
+    refs = [threats_ref.document(threat_id) for threat_id in threat_ids]
+    if not refs:
+        return {}
+    return {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
 # -------------------------
 # Get all threats
 # -------------------------
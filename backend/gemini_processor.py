@@ -1,29 +1,49 @@
 import os
+import time
+import threading
 from gemini_client import summarize_fight
-from firebase_client import insert_threat, update_threat
+from firebase_client import insert_threat, update_threat, threats_ref
 from state import state, lock
 import config
 from messages import process_threat_alerts
+import job_queue
+from retention import schedule_delete
 
 # -----------------------------
 # Config
 # -----------------------------
-THREAT_THRESHOLD = 6
+THREAT_THRESHOLD = config.THREAT_THRESHOLD
 
 # -----------------------------
 # Process a clip with Gemini
 # -----------------------------
-def process_clip(video_path, metadata):
+def process_clip(video_path, metadata, prescore=None):
     """
     Sends clip to Gemini, keeps top 2 clips in folder, and updates
     Firebase 'videos' field to always contain only top 2 clips.
+
+    Safe to run again for the same clip after a crash: a clip already
+    recorded in the job queue's top_clips is not re-sent to Gemini and
+    the Firebase update replaces rather than appends. Raises on failure
+    so the job queue can retry.
     """
-    try:
+    filename = os.path.basename(video_path)
+    known = job_queue.get_top_clip(filename)
+
+    if not known and not os.path.exists(video_path):
+        print("[Gemini] Clip already handled:", filename)
+        return
+
+    if known:
+        score = known["score"]
+        explanation = known["explanation"]
+        print("[Gemini] Resuming clip:", filename)
+    else:
         print("[Gemini] Sending clip:", video_path)
         result = summarize_fight(video_path)
         score = result["score"]
         explanation = result["explanation"]
-        print("[Gemini] Score:", score)
+        print("[Gemini] Score:", score, "| prescore:", prescore)
 
         # Discard low-score clips
         if score <= THREAT_THRESHOLD:
@@ -32,67 +52,147 @@ def process_clip(video_path, metadata):
             print("[Gemini] Low score. Clip deleted.")
             return
 
-        filename = os.path.basename(video_path)
-
-        with lock:
-            # Create threat if first valid clip
-            if not state.get("active_threat", False):
-                threat_id = insert_threat(
-                    score,
-                    explanation,
-                    videos=[filename],
-                    metadata=metadata
-                )
-                state["current_threat_id"] = threat_id
-                state["active_threat"] = True
-                print("[Gemini] New threat created:", threat_id)
-                process_threat_alerts(threat_id)
-
-            # Ensure threat folder exists
-            threat_folder = os.path.join(
-                config.OUTPUT_FOLDER,
-                state["current_threat_id"]
+    with lock:
+        # Create threat if first valid clip
+        if not state.get("active_threat", False):
+            threat_id = insert_threat(
+                score,
+                explanation,
+                videos=[filename],
+                metadata=metadata
             )
-            os.makedirs(threat_folder, exist_ok=True)
+            state["current_threat_id"] = threat_id
+            state["active_threat"] = True
+            job_queue.set_current_threat(threat_id)
+            print("[Gemini] New threat created:", threat_id)
+            process_threat_alerts(threat_id)
+
+        # Ensure threat folder exists
+        threat_folder = os.path.join(
+            config.OUTPUT_FOLDER,
+            state["current_threat_id"]
+        )
+        os.makedirs(threat_folder, exist_ok=True)
 
-            # Move clip immediately to threat folder
-            dest = os.path.join(threat_folder, filename)
+        dest = os.path.join(threat_folder, filename)
+        clip = {
+            "score": score,
+            "path": dest,
+            "explanation": explanation,
+            "metadata": metadata
+        }
+
+        # Record before moving so a retry knows the verdict
+        job_queue.save_top_clip(state["current_threat_id"], clip)
+
+        # Move clip immediately to threat folder
+        if os.path.exists(video_path):
             os.replace(video_path, dest)
 
-            # Track clip in memory
-            if "top_clips" not in state:
-                state["top_clips"] = []
-
-            state["top_clips"].append({
-                "score": score,
-                "path": dest,
-                "explanation": explanation,
-                "metadata": metadata
-            })
-
-            # Keep only top 2 highest scores
-            state["top_clips"].sort(key=lambda x: x["score"], reverse=True)
-            while len(state["top_clips"]) > 2:
-                lowest = state["top_clips"].pop()
-                if os.path.exists(lowest["path"]):
-                    os.remove(lowest["path"])
-                    print("[Gemini] Removed lower scoring clip:", lowest["path"])
-
-            # 🔹 Always update Firebase 'videos' field to top 2 clips
-            top_2_filenames = [os.path.basename(c["path"]) for c in state["top_clips"]]
-            best = state["top_clips"][0]
-
-            update_threat(
-                state["current_threat_id"],
-                best["score"],
-                best["explanation"],
-                new_videos=top_2_filenames,  # always only top 2
-                metadata=best["metadata"],
-                replace_videos=True
-            )
-            print("[Gemini] Threat updated with top 2 clips:", top_2_filenames)
+        # Track clip in memory
+        if "top_clips" not in state:
+            state["top_clips"] = []
+
+        if not any(c["path"] == dest for c in state["top_clips"]):
+            state["top_clips"].append(clip)
+
+        # Keep only top 2 highest scores
+        state["top_clips"].sort(key=lambda x: x["score"], reverse=True)
+        while len(state["top_clips"]) > 2:
+            lowest = state["top_clips"].pop()
+            job_queue.delete_top_clip(os.path.basename(lowest["path"]))
+            # Deleted off-thread so the lock is not held during disk IO
+            schedule_delete(lowest["path"])
+            print("[Gemini] Removed lower scoring clip:", lowest["path"])
+
+        # 🔹 Always update Firebase 'videos' field to top 2 clips
+        top_2_filenames = [os.path.basename(c["path"]) for c in state["top_clips"]]
+        best = state["top_clips"][0]
+
+        update_threat(
+            state["current_threat_id"],
+            best["score"],
+            best["explanation"],
+            new_videos=top_2_filenames,  # always only top 2
+            metadata=best["metadata"],
+            replace_videos=True
+        )
+        print("[Gemini] Threat updated with top 2 clips:", top_2_filenames)
+
+
+# -----------------------------
+# Queue workers
+# -----------------------------
+def restore_state():
+    """
+    Reloads the current threat and its top clips after a restart, but
+    only while the threat is still active and unresolved in Firebase.
+    Otherwise the next incident starts a new threat (and alert).
+    """
+    threat_id = job_queue.get_current_threat()
+    if not threat_id:
+        return
+
+    try:
+        doc = threats_ref.document(threat_id).get()
+    except Exception as e:
+        print(f"[Gemini] Could not check threat {threat_id}, not restoring:", e)
+        return
+
+    data = doc.to_dict() if doc.exists else {}
+    if not data.get("active", False) or data.get("resolved", False):
+        job_queue.clear_current_threat(threat_id)
+        print(f"[Gemini] Threat {threat_id} is over, starting fresh.")
+        return
+
+    with lock:
+        state["current_threat_id"] = threat_id
+        state["active_threat"] = True
+        state["top_clips"] = job_queue.load_top_clips(threat_id)
+    print(f"[Gemini] Restored threat {threat_id} with {len(state['top_clips'])} clips.")
+
+
+def worker_loop():
+    while True:
+        # Nothing may escape this loop: a dead worker thread is never
+        # restarted and the queue would silently stall
+        try:
+            run_next_job()
+        except Exception as e:
+            print("[Gemini] Worker error:", e)
+            time.sleep(config.JOB_POLL_INTERVAL)
+
 
+def run_next_job():
+    job = job_queue.claim()
+    if job is None:
+        time.sleep(config.JOB_POLL_INTERVAL)
+        return
+
+    try:
+        process_clip(job["clip_path"], job["metadata"], job["prescore"])
     except Exception as e:
         print("[Gemini] Processing failed:", e)
-        if os.path.exists(video_path):
-            os.remove(video_path)
\ No newline at end of file
+        if job_queue.fail(job["id"], e) == "failed":
+            print("[Gemini] Giving up on clip:", job["clip_path"])
+            if os.path.exists(job["clip_path"]):
+                os.remove(job["clip_path"])
+        return
+
+    # If this raises, the lease expires and the job is retried;
+    # process_clip is idempotent for that case
+    job_queue.complete(job["id"])
+
+
+def start_workers(count=config.GEMINI_WORKERS):
+    """
+    Recovers the queue from the last run and starts the Gemini
+    worker threads.
+    """
+    job_queue.init_db()
+    job_queue.recover()
+    job_queue.sweep_orphans(os.path.join(config.OUTPUT_FOLDER, "temp"))
+    restore_state()
+
+    for _ in range(count):
+        threading.Thread(target=worker_loop, daemon=True).start()
@@ -0,0 +1,354 @@
+"""
+Durable SQLite job queue for clips waiting on Gemini.
+
+Every saved clip is recorded as a job before any worker touches it, so
+a crash never loses an incident. Workers claim jobs with a lease
+(at-least-once): a job is only removed from the queue once
+`complete` is called, and unfinished jobs go back to pending on
+startup. The top clips of the current threat are stored here too so
+`state["top_clips"]` survives restarts.
+
+Job states: pending -> processing -> done / failed
+            deferred (below the prescore floor, not sent)
+"""
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clip_path TEXT NOT NULL UNIQUE,
+    metadata TEXT,
+    prescore REAL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+
+CREATE TABLE IF NOT EXISTS top_clips (
+    filename TEXT PRIMARY KEY,
+    threat_id TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    explanation TEXT,
+    metadata TEXT,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _open():
+    # One short-lived connection per call keeps this safe across
+    # threads and processes; WAL lets readers run during writes.
+    conn = sqlite3.connect(config.JOB_QUEUE_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+@contextmanager
+def _connect():
+    conn = _open()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_db():
+    with _connect() as conn:
+        conn.executescript(SCHEMA)
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["metadata"] = json.loads(job["metadata"]) if job["metadata"] else None
+    return job
+
+
+# -------------------------
+# Jobs
+# -------------------------
+def enqueue(clip_path, metadata, prescore=None, state="pending"):
+    now = time.time()
+    with _connect() as conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO jobs "
+            "(clip_path, metadata, prescore, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (clip_path, json.dumps(metadata), prescore, state, now, now)
+        )
+        return cur.lastrowid
+
+
+def claim(lease_seconds=config.JOB_LEASE_SECONDS):
+    """
+    Takes the oldest pending job (or one whose lease expired) and
+    marks it processing. Returns the job dict or None.
+    """
+    now = time.time()
+    conn = _open()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE state = 'pending' "
+            "OR (state = 'processing' AND lease_until < ?) "
+            "ORDER BY created_at LIMIT 1",
+            (now,)
+        ).fetchone()
+
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        conn.execute(
+            "UPDATE jobs SET state = 'processing', attempts = attempts + 1, "
+            "lease_until = ?, updated_at = ? WHERE id = ?",
+            (now + lease_seconds, now, row["id"])
+        )
+        conn.execute("COMMIT")
+
+        job = _job(row)
+        job["attempts"] += 1
+        return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def complete(job_id):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET state = 'done', lease_until = NULL, updated_at = ? "
+            "WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+
+def fail(job_id, error, max_attempts=config.JOB_MAX_ATTEMPTS):
+    """
+    Puts the job back to pending, or marks it failed once it has
+    used up its attempts. Returns the new state.
+    """
+    with _connect() as conn:
+        row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        state = "failed" if row and row["attempts"] >= max_attempts else "pending"
+        conn.execute(
+            "UPDATE jobs SET state = ?, error = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ?",
+            (state, str(error), time.time(), job_id)
+        )
+    return state
+
+
+def requeue_deferred():
+    """Sends every deferred clip to Gemini after all."""
+    with _connect() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET state = 'pending', updated_at = ? WHERE state = 'deferred'",
+            (time.time(),)
+        )
+        return cur.rowcount
+
+
+def counts():
+    with _connect() as conn:
+        rows = conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+    return {row["state"]: row["n"] for row in rows}
+
+
+def set_state(clip_path, state):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE clip_path = ?",
+            (state, time.time(), clip_path)
+        )
+
+
+def unfinished_clip_paths():
+    """Absolute paths of clips that a pending or processing job still needs."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT clip_path FROM jobs WHERE state IN ('pending', 'processing')"
+        ).fetchall()
+    return {os.path.abspath(row["clip_path"]) for row in rows}
+
+
+def deferred_clips():
+    with _connect() as conn:
+        rows = conn.execute("SELECT * FROM jobs WHERE state = 'deferred'").fetchall()
+    return [_job(row) for row in rows]
+
+
+# -------------------------
+# Startup recovery
+# -------------------------
+def recover():
+    """
+    Returns jobs left in processing by a crashed run to pending.
+    Call once at startup, before any worker starts.
+    """
+    with _connect() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET state = 'pending', lease_until = NULL, updated_at = ? "
+            "WHERE state = 'processing'",
+            (time.time(),)
+        )
+        resumed = cur.rowcount
+        pending = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = 'pending'"
+        ).fetchone()[0]
+
+    if pending:
+        print(f"[Queue] Resuming {pending} unfinished jobs ({resumed} were in flight).")
+    return pending
+
+
+def sweep_orphans(temp_folder):
+    """
+    Deletes clips in `temp_folder` that no unfinished job points to
+    (e.g. left behind by a crash mid-export) and fails jobs whose
+    clip no longer exists.
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT id, clip_path FROM jobs WHERE state IN ('pending', 'processing')"
+        ).fetchall()
+        moved = {
+            r["filename"] for r in conn.execute("SELECT filename FROM top_clips")
+        }
+
+        live = set()
+        for row in rows:
+            path = os.path.abspath(row["clip_path"])
+            filename = os.path.basename(path)
+            # A clip already moved into its threat folder is still resumable
+            if os.path.exists(path) or filename in moved:
+                live.add(path)
+            else:
+                conn.execute(
+                    "UPDATE jobs SET state = 'failed', error = 'clip missing', "
+                    "updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"])
+                )
+
+    removed = 0
+    if os.path.isdir(temp_folder):
+        for name in os.listdir(temp_folder):
+            path = os.path.abspath(os.path.join(temp_folder, name))
+            if os.path.isfile(path) and path not in live:
+                os.remove(path)
+                removed += 1
+
+    if removed:
+        print(f"[Queue] Swept {removed} orphaned temp files.")
+    return removed
+
+
+# -------------------------
+# Threat state
+# -------------------------
+def get_current_threat():
+    with _connect() as conn:
+        row = conn.execute("SELECT value FROM kv WHERE key = 'current_threat_id'").fetchone()
+    return row["value"] if row else None
+
+
+def set_current_threat(threat_id):
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value) VALUES ('current_threat_id', ?)",
+            (threat_id,)
+        )
+
+
+def clear_current_threat(threat_id):
+    """Forgets a threat that is over, along with its stored top clips."""
+    with _connect() as conn:
+        conn.execute(
+            "DELETE FROM kv WHERE key = 'current_threat_id' AND value = ?",
+            (threat_id,)
+        )
+        conn.execute("DELETE FROM top_clips WHERE threat_id = ?", (threat_id,))
+
+
+def get_top_clip(filename):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM top_clips WHERE filename = ?", (filename,)).fetchone()
+    return _clip(row) if row else None
+
+
+def save_top_clip(threat_id, clip):
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO top_clips "
+            "(filename, threat_id, score, path, explanation, metadata, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.basename(clip["path"]), threat_id, clip["score"],
+                clip["path"], clip["explanation"], json.dumps(clip["metadata"]),
+                time.time()
+            )
+        )
+
+
+def delete_top_clip(filename):
+    with _connect() as conn:
+        conn.execute("DELETE FROM top_clips WHERE filename = ?", (filename,))
+
+
+def load_top_clips(threat_id):
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM top_clips WHERE threat_id = ? ORDER BY score DESC",
+            (threat_id,)
+        ).fetchall()
+    return [_clip(row) for row in rows]
+
+
+def _clip(row):
+    return {
+        "score": row["score"],
+        "path": row["path"],
+        "explanation": row["explanation"],
+        "metadata": json.loads(row["metadata"]) if row["metadata"] else None
+    }
+
+
+def threat_summaries():
+    """
+    threat_id -> {"camera_id", "score"} for every threat with stored
+    clips; score is the best clip score.
+    """
+    with _connect() as conn:
+        rows = conn.execute("SELECT threat_id, score, metadata FROM top_clips").fetchall()
+
+    summaries = {}
+    for row in rows:
+        metadata = json.loads(row["metadata"]) if row["metadata"] else {}
+        camera_id = ((metadata or {}).get("camera") or {}).get("camera_id")
+        summary = summaries.setdefault(row["threat_id"], {"camera_id": camera_id, "score": 0})
+        summary["score"] = max(summary["score"], row["score"])
+    return summaries
+
+
+def delete_threat_clips(threat_id):
+    with _connect() as conn:
+        conn.execute("DELETE FROM top_clips WHERE threat_id = ?", (threat_id,))
@@ -1,10 +1,17 @@
 import os
 import config
-from video_processor import process_video
-from firebase_cleanup import start_cleanup_thread
 
 os.makedirs(config.OUTPUT_FOLDER, exist_ok=True)
 
 if __name__ == "__main__":
+    # Imported here so multiprocess-mode children, which re-import this
+    # module, don't set up Firebase and Gemini clients they never use
+    from video_processor import process_video
+    from firebase_cleanup import start_cleanup_thread
+    from gemini_processor import start_workers
+    from retention import start_retention_thread
+
     start_cleanup_thread()
+    start_workers()
+    start_retention_thread()
     process_video(config.VIDEO_PATH)
\ No newline at end of file
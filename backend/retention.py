@@ -0,0 +1,308 @@
+"""
+Disk retention for OUTPUT_FOLDER.
+
+A background pass keeps clip storage under a per-camera and a global
+quota, removes resolved threats past RETENTION_MAX_AGE_HOURS and
+abandoned temp clips. Deletes go through a queue drained in small
+batches by a separate thread, so callers (including code holding the
+global lock) never block on the filesystem.
+
+Eviction order when over quota:
+  1. deferred clips
+  2. resolved threats
+  3. unresolved threats (only if still over quota)
+lowest score first, then oldest. Only resolved threats are subject to
+the age limit. The current threat, threats still active in Firebase,
+and threats whose status can't be read are never evicted.
+"""
+import os
+import json
+import time
+import queue
+import shutil
+import threading
+import config
+import job_queue
+
+MB = 1024 * 1024
+RESERVED = {"temp", "deferred"}
+
+_delete_queue = queue.Queue()
+_deleter_lock = threading.Lock()
+_deleter_started = False
+
+_stats = {"evicted_total": 0, "bytes_freed_total": 0}
+
+
+# -------------------------
+# Async batched deletion
+# -------------------------
+def schedule_delete(path):
+    """Queues a file or folder for deletion and returns immediately."""
+    global _deleter_started
+    with _deleter_lock:
+        if not _deleter_started:
+            threading.Thread(target=_deleter_loop, daemon=True).start()
+            _deleter_started = True
+    _delete_queue.put(path)
+
+
+def _deleter_loop():
+    while True:
+        batch = [_delete_queue.get()]
+        while len(batch) < config.RETENTION_DELETE_BATCH:
+            try:
+                batch.append(_delete_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for path in batch:
+            _remove(path)
+        time.sleep(config.RETENTION_DELETE_PAUSE)
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print("[Retention] Could not delete", path, e)
+
+
+# -------------------------
+# Usage
+# -------------------------
+def folder_size(path):
+    """Returns (bytes, newest mtime) for a folder."""
+    total, newest = 0, 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+
+def disk_usage(base_folder=config.OUTPUT_FOLDER):
+    """Bytes per top-level folder; cheap enough for /debug."""
+    folders = {}
+    if os.path.isdir(base_folder):
+        for name in os.listdir(base_folder):
+            path = os.path.join(base_folder, name)
+            if os.path.isdir(path):
+                folders[name] = folder_size(path)[0]
+    return {
+        "total_bytes": sum(folders.values()),
+        "global_quota_bytes": config.RETENTION_GLOBAL_QUOTA_MB * MB,
+        "camera_quota_bytes": config.RETENTION_CAMERA_QUOTA_MB * MB,
+        "folders": folders
+    }
+
+
+def load_stats(base_folder=config.OUTPUT_FOLDER):
+    """Stats written by the last retention pass, or None."""
+    path = os.path.join(base_folder, config.RETENTION_STATS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# -------------------------
+# Retention pass
+# -------------------------
+def _firebase_threats(threat_ids):
+    """Firebase docs for the threat folders on disk, or None if unreachable."""
+    try:
+        from firebase_client import get_threats
+        return get_threats(threat_ids)
+    except Exception as e:
+        print("[Retention] Could not read threat status:", e)
+        return None
+
+
+def _sweep_temp(base_folder, now):
+    """Removes temp clips no job needs once they are old enough."""
+    folder = os.path.join(base_folder, "temp")
+    if not os.path.isdir(folder):
+        return 0
+
+    live = job_queue.unfinished_clip_paths()
+    removed = 0
+    for name in os.listdir(folder):
+        path = os.path.abspath(os.path.join(folder, name))
+        if path in live or not os.path.isfile(path):
+            continue
+        if now - os.path.getmtime(path) > config.TEMP_MAX_AGE_SECONDS:
+            schedule_delete(path)
+            removed += 1
+    return removed
+
+
+def _collect_items(base_folder):
+    """
+    Everything that counts toward the quotas, as dicts with
+    path, camera, bytes, mtime, score, priority and protected.
+    """
+    items = []
+    current = job_queue.get_current_threat()
+    summaries = job_queue.threat_summaries()
+
+    for job in job_queue.deferred_clips():
+        path = job["clip_path"]
+        if not os.path.exists(path):
+            continue
+        camera = ((job["metadata"] or {}).get("camera") or {}).get("camera_id")
+        items.append({
+            "kind": "deferred",
+            "path": path,
+            "camera": camera or "unknown",
+            "bytes": os.path.getsize(path),
+            "mtime": os.path.getmtime(path),
+            "score": job["prescore"] or 0,
+            "priority": 0,
+            "resolved": True,
+            "protected": False
+        })
+
+    folders = [
+        name for name in os.listdir(base_folder)
+        if name not in RESERVED and os.path.isdir(os.path.join(base_folder, name))
+    ]
+    threats = _firebase_threats(folders)
+
+    for name in folders:
+        path = os.path.join(base_folder, name)
+        size, mtime = folder_size(path)
+
+        if threats is None:
+            # Status unknown without Firebase: keep it for this pass.
+            # top_clips is the only local record of camera and score.
+            summary = summaries.get(name, {})
+            camera, score = summary.get("camera_id"), summary.get("score", 0)
+            active, resolved, known = False, False, False
+        else:
+            # A deleted document counts as resolved
+            doc = threats.get(name, {"resolved": True})
+            camera = ((doc.get("metadata") or {}).get("camera") or {}).get("camera_id")
+            score = doc.get("score", 0)
+            resolved = doc.get("resolved", False)
+            # firebase_cleanup clears `active` seconds after last_seen,
+            # so an inactive threat can still be open on the dashboard
+            active = doc.get("active", False) and not resolved
+            known = True
+
+        items.append({
+            "kind": "threat",
+            "path": path,
+            "threat_id": name,
+            "camera": camera or "unknown",
+            "bytes": size,
+            "mtime": mtime,
+            "score": score,
+            "priority": 1 if resolved else 2,
+            "resolved": resolved,
+            "protected": name == current or active or not known
+        })
+
+    return items
+
+
+def _evict(item):
+    schedule_delete(item["path"])
+    if item["kind"] == "threat":
+        job_queue.delete_threat_clips(item["threat_id"])
+    else:
+        job_queue.set_state(item["path"], "evicted")
+    print(f"[Retention] Evicting {item['kind']} {item['path']} ({item['bytes'] / MB:.1f} MB)")
+
+
+def run_once(base_folder=config.OUTPUT_FOLDER):
+    now = time.time()
+    if not os.path.isdir(base_folder):
+        return None
+
+    temp_removed = _sweep_temp(base_folder, now)
+    items = _collect_items(base_folder)
+    evicted = []
+
+    def evict(item):
+        evicted.append(item)
+        _evict(item)
+
+    # Age limit for resolved threats only
+    max_age = config.RETENTION_MAX_AGE_HOURS * 3600
+    for item in items:
+        if not item["protected"] and item["resolved"] and now - item["mtime"] > max_age:
+            evict(item)
+
+    candidates = sorted(
+        (i for i in items if not i["protected"] and i not in evicted),
+        key=lambda i: (i["priority"], i["score"], i["mtime"])
+    )
+
+    # Per-camera quota
+    camera_quota = config.RETENTION_CAMERA_QUOTA_MB * MB
+    usage = {}
+    for item in items:
+        if item not in evicted:
+            usage[item["camera"]] = usage.get(item["camera"], 0) + item["bytes"]
+
+    for item in candidates:
+        if usage[item["camera"]] > camera_quota:
+            usage[item["camera"]] -= item["bytes"]
+            evict(item)
+
+    # Global quota
+    global_quota = config.RETENTION_GLOBAL_QUOTA_MB * MB
+    total = sum(usage.values())
+    for item in candidates:
+        if total <= global_quota:
+            break
+        if item in evicted:
+            continue
+        usage[item["camera"]] -= item["bytes"]
+        total -= item["bytes"]
+        evict(item)
+
+    freed = sum(i["bytes"] for i in evicted)
+    _stats["evicted_total"] += len(evicted)
+    _stats["bytes_freed_total"] += freed
+
+    stats = {
+        "updated_at": now,
+        "total_bytes": total,
+        "global_quota_bytes": global_quota,
+        "camera_quota_bytes": camera_quota,
+        "cameras": usage,
+        "evicted_last_run": len(evicted),
+        "bytes_freed_last_run": freed,
+        "temp_removed_last_run": temp_removed,
+        "pending_deletes": _delete_queue.qsize(),
+        **_stats
+    }
+    # Write then rename so /debug never reads a half-written file
+    stats_path = os.path.join(base_folder, config.RETENTION_STATS_FILE)
+    with open(stats_path + ".tmp", "w") as f:
+        json.dump(stats, f, indent=2)
+    os.replace(stats_path + ".tmp", stats_path)
+
+    return stats
+
+
+def retention_loop():
+    while True:
+        try:
+            run_once()
+        except Exception as e:
+            print("[Retention] Pass failed:", e)
+        time.sleep(config.RETENTION_INTERVAL)
+
+
+def start_retention_thread():
+    threading.Thread(target=retention_loop, daemon=True).start()
@@ -0,0 +1,83 @@
+"""
+Zero-copy frame transport between processes.
+
+A FrameRing is a fixed set of frame-sized slots in one
+multiprocessing.shared_memory block. Only slot indices travel over
+queues: the producer takes a free index, writes the frame into that
+slot, and passes the index on. The last consumer puts the index back
+on `free`. Consumers read through `view(slot)`, a numpy array over the
+shared buffer, so frames are never pickled or copied.
+"""
+import os
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+
+
+class FrameRing:
+
+    def __init__(self, slots, shape, dtype=np.uint8, ctx=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        self.owner_pid = os.getpid()
+        self._map()
+
+        # Every slot starts free; producers block here when consumers lag
+        self.free = (ctx or multiprocessing).Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+
+    def _map(self):
+        self.frames = np.ndarray(
+            (self.slots, *self.shape), dtype=self.dtype, buffer=self.shm.buf
+        )
+
+    # Child processes get the block name and re-attach instead of
+    # pickling the buffer.
+    def __getstate__(self):
+        return {
+            "name": self.shm.name,
+            "slots": self.slots,
+            "shape": self.shape,
+            "dtype": self.dtype.str,
+            "free": self.free,
+            "owner_pid": self.owner_pid
+        }
+
+    def __setstate__(self, data):
+        self.slots = data["slots"]
+        self.shape = data["shape"]
+        self.dtype = np.dtype(data["dtype"])
+        self.slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.free = data["free"]
+        self.owner_pid = data["owner_pid"]
+
+        try:
+            # Python 3.13+: only the creating process should track the block
+            self.shm = shared_memory.SharedMemory(name=data["name"], track=False)
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name=data["name"])
+        self._map()
+
+    def acquire(self, timeout=None):
+        """Blocks until a slot is free and returns its index."""
+        return self.free.get(timeout=timeout)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def view(self, slot):
+        """Writable numpy view of one slot; no copy."""
+        return self.frames[slot]
+
+    def close(self):
+        # Drop the numpy view first or the buffer can't be released
+        self.frames = None
+        self.shm.close()
+        # Forked children inherit this object; only the creator unlinks
+        if os.getpid() == self.owner_pid:
+            self.shm.unlink()
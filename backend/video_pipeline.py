@@ -0,0 +1,213 @@
+"""
+Multiprocess mode for process_video.
+
+    decoder  --slot-->  inference  --slot, tracks-->  recorder
+       ^                                                  |
+       +-------------------- free slot -------------------+
+
+The decoder resizes each frame straight into a FrameRing slot; the
+inference and recorder processes read the same slot in place. Only
+slot indices and small track tuples cross process boundaries. Clips
+go to the job queue, where the Gemini workers in the main process
+pick them up. Runs headless.
+"""
+import os
+import time
+import multiprocessing
+import cv2
+import config
+from shared_frames import FrameRing
+from clip_manager import ClipWriter, defer_clip, TOTAL_FRAMES
+from clip_scorer import TrackStats, FlowMeter, score_features, prescore_floor
+from detection import load_roi, AdaptiveScheduler, detect_people, track_people
+from utils import load_video_metadata
+import job_queue
+
+
+# -------------------------
+# Decoder
+# -------------------------
+def decode_frames(video_path, ring, out_q):
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            slot = ring.acquire()
+            # Resize directly into shared memory, no intermediate frame
+            cv2.resize(frame, config.FRAME_SIZE, dst=ring.view(slot))
+            out_q.put(slot)
+    finally:
+        # Always tell the next stage we're done, even on error
+        out_q.put(None)
+        cap.release()
+        ring.close()
+
+
+# -------------------------
+# Inference
+# -------------------------
+def run_inference(video_path, ring, in_q, out_q):
+    try:
+        _inference_loop(video_path, ring, in_q, out_q)
+    finally:
+        out_q.put(None)
+        ring.close()
+
+
+def _inference_loop(video_path, ring, in_q, out_q):
+    from ultralytics import YOLO
+    model = YOLO(config.YOLO_MODEL)
+
+    roi = load_roi(load_video_metadata(video_path))
+    scheduler = AdaptiveScheduler()
+
+    prev_centers = {}
+    recording = False
+    frames_recorded = 0
+    last_capture_time = 0
+
+    while True:
+        slot = in_q.get()
+        if slot is None:
+            break
+
+        now = time.time()
+        frame = ring.view(slot)
+
+        people = detect_people(model, frame, roi, scheduler.imgsz(now))
+        prev_centers, tracks = track_people(prev_centers, people)
+
+        for *_, speed in tracks:
+            if speed is not None and speed > config.SPEED_THRESHOLD:
+                scheduler.mark_active(now)
+
+                if not recording and now - last_capture_time >= config.GEMINI_COOLDOWN:
+                    recording = True
+                    frames_recorded = 0
+                    last_capture_time = now
+                    print("Recording started.")
+
+        record = recording
+        if recording:
+            scheduler.mark_active(now)
+            frames_recorded += 1
+            if frames_recorded >= TOTAL_FRAMES:
+                recording = False
+
+        out_q.put((slot, tracks, record))
+
+
+# -------------------------
+# Recorder
+# -------------------------
+def record_clips(video_path, ring, in_q):
+    """
+    Streams recorded frames to disk as they arrive, so a clip never
+    holds ring slots. Scores and queues each finished clip.
+    """
+    metadata = load_video_metadata(video_path)
+    temp_folder = os.path.join(config.OUTPUT_FOLDER, "temp")
+    w, h = config.FRAME_SIZE
+
+    clip = None
+    frames = 0
+    track_stats = flow = None
+
+    try:
+        while True:
+            item = in_q.get()
+            if item is None:
+                break
+
+            slot, tracks, record = item
+
+            if record:
+                if clip is None:
+                    clip = ClipWriter(temp_folder, (w, h))
+                    frames = 0
+                    track_stats = TrackStats()
+                    flow = FlowMeter()
+
+                frame = ring.view(slot)
+                clip.write(frame)
+                track_stats.add(tracks)
+                flow.add(frame)
+                frames += 1
+
+            ring.release(slot)
+
+            if clip is not None and frames >= TOTAL_FRAMES:
+                print("Recording finished.")
+                clip_path = clip.finish()
+                clip = None
+
+                if clip_path:
+                    _queue_clip(clip_path, metadata, {**track_stats.features(), **flow.features()})
+    finally:
+        # Video ended (or we crashed) mid-recording: drop the partial clip
+        if clip is not None:
+            clip.abort()
+        ring.close()
+
+
+def _queue_clip(clip_path, metadata, features):
+    prescore = score_features(features)
+    print(f"Clip prescore: {prescore:.2f}")
+
+    if prescore >= prescore_floor():
+        job_queue.enqueue(clip_path, metadata, prescore)
+    elif config.PRESCORE_ACTION == "defer":
+        defer_clip(clip_path, metadata, prescore)
+        print("Below prescore floor. Clip deferred.")
+    else:
+        os.remove(clip_path)
+        print("Below prescore floor. Clip dropped.")
+
+
+# -------------------------
+# Entry point
+# -------------------------
+def _check_exit_codes(processes):
+    for p in processes:
+        if p.exitcode not in (None, 0):
+            raise RuntimeError(f"Pipeline {p.name} process exited with code {p.exitcode}")
+
+
+def run_pipeline(video_path):
+    """
+    Runs decoder, inference and recorder as separate processes for
+    one video and waits for them to finish.
+    """
+    ctx = multiprocessing.get_context(config.PIPELINE_START_METHOD)
+    w, h = config.FRAME_SIZE
+    ring = FrameRing(config.FRAME_RING_SLOTS, (h, w, 3), ctx=ctx)
+
+    decoded_q = ctx.Queue()
+    detected_q = ctx.Queue()
+
+    processes = [
+        ctx.Process(target=decode_frames, args=(video_path, ring, decoded_q), name="decoder"),
+        ctx.Process(target=run_inference, args=(video_path, ring, decoded_q, detected_q), name="inference"),
+        ctx.Process(target=record_clips, args=(video_path, ring, detected_q), name="recorder"),
+    ]
+
+    for p in processes:
+        p.start()
+
+    try:
+        # Poll instead of join() so a crashed stage can't leave the
+        # others blocked on queues or ring slots forever
+        while any(p.is_alive() for p in processes):
+            _check_exit_codes(processes)
+            time.sleep(0.5)
+        _check_exit_codes(processes)
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        ring.close()
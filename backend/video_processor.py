@@ -1,18 +1,27 @@
 import os
 import cv2
-import numpy as np
 import time
-import threading
 from ultralytics import YOLO
-from clip_manager import save_clip, TOTAL_FRAMES
-from gemini_processor import process_clip
+from clip_manager import save_clip, save_deferred_clip, TOTAL_FRAMES
+from clip_scorer import TrackStats, clip_features, score_features, prescore_floor
+import job_queue
 from state import state, lock
 import config
 from utils import load_video_metadata
+from detection import load_roi, AdaptiveScheduler, detect_people, track_people
 
 os.makedirs(config.OUTPUT_FOLDER, exist_ok=True)
 
-model = YOLO(config.YOLO_MODEL)
+# Loaded on first use so pipeline child processes that import this
+# module don't each pay for a model they never run
+model = None
+
+
+def load_model():
+    global model
+    if model is None:
+        model = YOLO(config.YOLO_MODEL)
+    return model
 
 
 def draw_boxes(frame, boxes_data):
@@ -38,64 +47,60 @@ def draw_boxes(frame, boxes_data):
     return frame
 
 
-def process_video(video_path):
+def process_video(video_path, multiprocess=config.MULTIPROCESS):
+    if multiprocess:
+        from video_pipeline import run_pipeline
+        return run_pipeline(video_path)
 
+    model = load_model()
     cap = cv2.VideoCapture(video_path)
     metadata = load_video_metadata(video_path)
+    roi = load_roi(metadata)
+    scheduler = AdaptiveScheduler()
 
     frames_buffer = []
+    track_stats = TrackStats()
 
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        frame_resized = cv2.resize(frame, (640, 360))
+        now = time.time()
+        frame_resized = cv2.resize(frame, config.FRAME_SIZE)
         display_frame = frame_resized.copy()   # annotated version for display
-        clean_frame = frame_resized.copy()     # no annotations — saved to clip
+        clean_frame = frame_resized            # no annotations — saved to clip
 
-        results = model(frame_resized)
-        new_centers = {}
+        people = detect_people(
+            model, frame_resized, roi, scheduler.imgsz(now)
+        )
+        new_centers, tracks = track_people(state["prev_centers"], people)
         boxes_data = []
 
         # --------- Detection ---------
-        for r in results:
-            for i, box in enumerate(r.boxes):
-                cls = int(box.cls[0])
-                label = model.names[cls]
-
-                if label == "person":
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                    new_centers[i] = (cx, cy)
-
-                    prev = state["prev_centers"].get(i)
-                    is_fighting = False
-
-                    if prev:
-                        dx = abs(cx - prev[0])
-                        dy = abs(cy - prev[1])
-                        speed = np.sqrt(dx**2 + dy**2)
-
-                        if speed > config.SPEED_THRESHOLD:
-                            is_fighting = True
-                            now = time.time()
-
-                            with lock:
-                                can_capture = (
-                                    not state["recording"] and
-                                    now - state["last_capture_time"]
-                                    >= config.GEMINI_COOLDOWN
-                                )
-
-                                if can_capture:
-                                    state["recording"] = True
-                                    state["frames_recorded"] = 0
-                                    frames_buffer = []
-                                    state["last_capture_time"] = now
-                                    print("Recording started.")
-
-                    boxes_data.append((x1, y1, x2, y2, is_fighting))
+        for x1, y1, x2, y2, speed in tracks:
+            is_fighting = False
+
+            if speed is not None and speed > config.SPEED_THRESHOLD:
+                is_fighting = True
+                scheduler.mark_active(now)
+
+                with lock:
+                    can_capture = (
+                        not state["recording"] and
+                        now - state["last_capture_time"]
+                        >= config.GEMINI_COOLDOWN
+                    )
+
+                    if can_capture:
+                        state["recording"] = True
+                        state["frames_recorded"] = 0
+                        frames_buffer = []
+                        track_stats = TrackStats()
+                        state["last_capture_time"] = now
+                        print("Recording started.")
+
+            boxes_data.append((x1, y1, x2, y2, is_fighting))
 
         state["prev_centers"] = new_centers
 
@@ -104,22 +109,32 @@ def process_video(video_path):
 
         # --------- Recording Logic ---------
         if state["recording"]:
+            scheduler.mark_active(now)
             frames_buffer.append(clean_frame)   # save clean frames
+            track_stats.add(tracks)
             state["frames_recorded"] += 1
 
             if state["frames_recorded"] >= TOTAL_FRAMES:
                 state["recording"] = False
                 print("Recording finished.")
 
-                temp_folder = os.path.join(config.OUTPUT_FOLDER, "temp")
-                clip_path = save_clip(frames_buffer, temp_folder)
+                # --------- Local pre-score ---------
+                features = clip_features(frames_buffer, track_stats)
+                prescore = score_features(features)
+                print(f"Clip prescore: {prescore:.2f}")
+
+                if prescore < prescore_floor():
+                    if config.PRESCORE_ACTION == "defer":
+                        save_deferred_clip(frames_buffer, metadata, prescore)
+                        print("Below prescore floor. Clip deferred.")
+                    else:
+                        print("Below prescore floor. Clip dropped.")
+                else:
+                    temp_folder = os.path.join(config.OUTPUT_FOLDER, "temp")
+                    clip_path = save_clip(frames_buffer, temp_folder)
 
-                if clip_path:
-                    threading.Thread(
-                        target=process_clip,
-                        args=(clip_path, metadata),
-                        daemon=True
-                    ).start()
+                    if clip_path:
+                        job_queue.enqueue(clip_path, metadata, prescore)
 
         cv2.imshow("Surveillance", display_frame)   # show annotated
         if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -130,4 +145,6 @@ def process_video(video_path):
 
 
 if __name__ == "__main__":
+    from gemini_processor import start_workers
+    start_workers()
     process_video(config.VIDEO_PATH)
\ No newline at end of file